@@ -8,6 +8,7 @@ import subprocess
 import sys
 import os
 import platform
+import importlib.util
 from pathlib import Path
 
 def main():
@@ -34,6 +35,14 @@ def main():
     # Add source directory to Python path
     sys.path.insert(0, str(src_dir))
     
+    # Check for Streamlit up front - once exec'd there is no launcher left to report it
+    if importlib.util.find_spec("streamlit") is None:
+        print("❌ Error: Streamlit not found!")
+        print("Please install Streamlit: pip install streamlit")
+        if platform.system() == "Windows":
+            print("💡 Try running: windows_setup.bat")
+        return 1
+    
     # Construct Streamlit command
     cmd = [
         sys.executable, "-m", "streamlit", "run", 
@@ -58,17 +67,17 @@ def main():
         print("=" * 50)
         
         # Run the Streamlit app
-        subprocess.run(cmd)
+        if platform.system() == "Windows":
+            # os.exec* on Windows spawns a new process and detaches the console
+            subprocess.run(cmd)
+        else:
+            # Replace this launcher with Streamlit instead of idling as its parent
+            sys.stdout.flush()
+            os.execv(sys.executable, cmd)
         
     except KeyboardInterrupt:
         print("\n🛑 Application stopped by user")
         return 0
-    except FileNotFoundError:
-        print("❌ Error: Streamlit not found!")
-        print("Please install Streamlit: pip install streamlit")
-        if platform.system() == "Windows":
-            print("💡 Try running: windows_setup.bat")
-        return 1
     except Exception as e:
         print(f"❌ Error starting application: {e}")
         if platform.system() == "Windows":
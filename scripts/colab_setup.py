@@ -8,19 +8,52 @@ import subprocess
 import sys
 import os
 import time
+import json
+import hashlib
+import platform
+import random
+import shutil
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from pathlib import Path
 
-def run_command(command, description="Running command", check=True, shell=False):
-    """Run a command with proper error handling"""
+# Persistent pip cache: Google Drive survives Colab restarts, /content does not
+DRIVE_PIP_CACHE_DIR = "/content/drive/MyDrive/.pip-cache"
+LOCAL_PIP_CACHE_DIR = "/content/.pip-cache"
+
+def configure_pip_cache():
+    """Point pip at a persistent wheel/HTTP cache so re-runs skip downloads"""
+    if os.path.isdir("/content/drive/MyDrive"):
+        cache_dir = DRIVE_PIP_CACHE_DIR
+    else:
+        cache_dir = LOCAL_PIP_CACHE_DIR
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ["PIP_CACHE_DIR"] = cache_dir
+    print(f"📦 Using pip cache at {cache_dir}")
+    return cache_dir
+
+def pip_install_command(*args):
+    """Build a pip install command that uses the configured cache"""
+    cmd = [sys.executable, "-m", "pip", "install", "--disable-pip-version-check"]
+    cache_dir = os.environ.get("PIP_CACHE_DIR")
+    if cache_dir:
+        cmd += ["--cache-dir", cache_dir]
+    return cmd + list(args)
+
+def run_command(command, description="Running command", check=True, shell=False, stream=False):
+    """Run a command with proper error handling
+    
+    With stream=True the command writes straight to the console instead of
+    having its whole output buffered through a pipe (apt-get, wine, ...)
+    """
     print(f"🔄 {description}...")
     try:
-        if shell:
-            result = subprocess.run(command, shell=True, check=check, capture_output=True, text=True)
-        else:
-            result = subprocess.run(command, check=check, capture_output=True, text=True)
+        output = {} if stream else {"capture_output": True, "text": True}
+        result = subprocess.run(command, shell=shell, check=check, **output)
         
-        if result.stdout:
+        if stream or result.stdout:
             print(f"✅ {description} completed")
         return True
     except subprocess.CalledProcessError as e:
@@ -32,23 +65,174 @@ def run_command(command, description="Running command", check=True, shell=False)
             print(f"STDERR: {e.stderr}")
         return False
 
+def run_with_backoff(func, retries=3, base=0.5, cap=30):
+    """Retry a step that reports failure by returning False, with jittered exponential backoff"""
+    for attempt in range(retries):
+        result = func()
+        if result or attempt == retries - 1:
+            return result
+        
+        # Jitter keeps restarted sessions from retrying against a mirror in lockstep
+        delay = min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        print(f"🔁 Retrying in {delay:.1f}s ({attempt + 1}/{retries - 1})...")
+        time.sleep(delay)
+
+def missing_requirements(requirements):
+    """Return the requirements not already satisfied by installed distributions"""
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        from packaging.requirements import Requirement
+    except ImportError:
+        # Can't check locally - let pip decide
+        return list(requirements)
+    
+    missing = []
+    for requirement in requirements:
+        req = Requirement(requirement)
+        try:
+            installed = version(req.name)
+        except PackageNotFoundError:
+            missing.append(requirement)
+            continue
+        if not req.specifier.contains(installed, prereleases=True):
+            missing.append(requirement)
+    return missing
+
+def requirements_lock_path(requirements):
+    """Lock file for this requirement list, Python version and platform"""
+    cache_dir = os.environ.get("PIP_CACHE_DIR", LOCAL_PIP_CACHE_DIR)
+    digest = hashlib.sha1("\n".join(requirements).encode()).hexdigest()[:10]
+    tag = f"py{sys.version_info.major}{sys.version_info.minor}-{platform.machine()}"
+    return os.path.join(cache_dir, f"requirements-{tag}-{digest}.lock")
+
+def write_requirements_lock(requirements, lock_path):
+    """Resolve what pip would install for requirements and pin it for later runs"""
+    report_path = lock_path + ".report.json"
+    resolved = run_command(
+        pip_install_command(
+            "--dry-run", "--only-binary=:all:", "--quiet", "--report", report_path, *requirements
+        ),
+        "Recording resolved package versions",
+        check=True
+    )
+    if not resolved:
+        return False
+    
+    try:
+        with open(report_path) as f:
+            report = json.load(f)
+        pins = [
+            f"{item['metadata']['name']}=={item['metadata']['version']}"
+            for item in report.get("install", [])
+        ]
+        with open(lock_path, "w") as f:
+            f.write("\n".join(pins) + "\n")
+        print(f"✅ Wrote {len(pins)} pinned packages to {lock_path}")
+        return True
+    except (OSError, KeyError, ValueError) as e:
+        print(f"⚠️ Could not write lock file: {e}")
+        return False
+    finally:
+        if os.path.exists(report_path):
+            os.remove(report_path)
+
+def pip_check_problems():
+    """Dependency problems reported by pip check, one entry per line"""
+    result = subprocess.run(
+        [sys.executable, "-m", "pip", "check", "--disable-pip-version-check"],
+        capture_output=True, text=True
+    )
+    return set(result.stdout.splitlines()) if result.returncode != 0 else set()
+
+# apt state shared by every apt_install call in this run
+_apt_updated = False
+_apt_installed = set()
+
+# Package lists refreshed more recently than this are reused as-is
+APT_LISTS_DIR = "/var/lib/apt/lists"
+APT_LISTS_MAX_AGE = 24 * 3600  # seconds
+
+def apt_lists_fresh():
+    """Check whether apt package lists were refreshed recently enough to skip an update"""
+    # Images that ran rm -rf /var/lib/apt/lists/* leave a recently modified but
+    # empty directory, so look at the package index files themselves
+    indexes = list(Path(APT_LISTS_DIR).glob("*_Packages"))
+    if not indexes:
+        return False
+    try:
+        newest = max(index.stat().st_mtime for index in indexes)
+    except OSError:
+        return False
+    return time.time() - newest < APT_LISTS_MAX_AGE
+
+def dpkg_installed(package):
+    """Check that dpkg has a package fully installed (not just leftover config files)"""
+    result = subprocess.run(
+        ["dpkg-query", "-W", "-f=${Status}", package],
+        capture_output=True, text=True
+    )
+    return result.returncode == 0 and result.stdout.strip() == "install ok installed"
+
+def apt_install(packages):
+    """Install apt packages, skipping ones already present and repeat updates"""
+    global _apt_updated
+    
+    # A local dpkg database lookup, much cheaper than an apt-get round
+    pending = [
+        pkg for pkg in packages
+        if pkg not in _apt_installed and not dpkg_installed(pkg)
+    ]
+    _apt_installed.update(pkg for pkg in packages if pkg not in pending)
+    
+    if not pending:
+        print(f"✅ Already installed: {' '.join(packages)}")
+        return True
+    
+    if not _apt_updated and apt_lists_fresh():
+        print("✅ apt package lists are fresh, skipping update")
+        _apt_updated = True
+    
+    if not _apt_updated:
+        _apt_updated = run_with_backoff(
+            lambda: run_command(["apt-get", "update"], "Updating apt package lists", stream=True)
+        )
+    
+    success = run_command(
+        ["apt-get", "install", "-y", "-o", "Dpkg::Options::=--force-confold"] + pending,
+        f"Installing {' '.join(pending)}",
+        stream=True
+    )
+    if success:
+        _apt_installed.update(pending)
+    return success
+
 def install_system_dependencies():
     """Install system-level dependencies required for MT5"""
     print("🔧 Installing system dependencies...")
     
-    commands = [
-        ["apt-get", "update"],
-        ["apt-get", "install", "-y", "wine", "winetricks", "xvfb"],
-        ["apt-get", "install", "-y", "python3-dev", "build-essential"],
-        ["apt-get", "install", "-y", "libffi-dev", "libssl-dev"],
-        ["apt-get", "clean"]
-    ]
+    # A PATH lookup is far cheaper than letting each apt call fail to spawn
+    if shutil.which("apt-get") is None:
+        print("⚠️ apt-get not found, skipping system dependencies")
+        return False
+    
+    # Never stop for debconf prompts in a non-interactive notebook
+    os.environ["DEBIAN_FRONTEND"] = "noninteractive"
     
-    for cmd in commands:
-        run_command(cmd, f"Running: {' '.join(cmd)}")
+    # One install so dpkg's startup and dependency solve run once
+    apt_install([
+        "wine", "winetricks", "xvfb",
+        "python3-dev", "build-essential",
+        "libffi-dev", "libssl-dev"
+    ])
+    
+    run_command(["apt-get", "clean"], "Running: apt-get clean", stream=True)
 
 def install_python_packages():
-    """Install Python packages for the BTC analyzer"""
+    """Install the core Python packages from wheels; returns the ones still missing
+    
+    Never builds from source, so it is safe to run before the apt build
+    toolchain is installed. Anything left over goes to install_source_packages.
+    """
     print("📦 Installing Python packages...")
     
     # Core packages for the application
@@ -63,24 +247,79 @@ def install_python_packages():
         "pytz>=2023.3"
     ]
     
-    # Install core packages
-    for package in packages:
+    # Only hand pip the requirements that aren't already satisfied
+    missing = missing_requirements(packages)
+    
+    if not missing:
+        print("✅ Core packages already installed")
+        batch_success = True
+    else:
+        # Resolve once and pin the result; later runs on the same image reuse it
+        lock_path = requirements_lock_path(missing)
+        if not os.path.exists(lock_path):
+            write_requirements_lock(missing, lock_path)
+        
+        batch_success = False
+        if os.path.exists(lock_path):
+            # The lock only pins what the first run had to install, so on a
+            # changed image --no-deps can leave dependencies missing. Compare
+            # pip check against the pre-existing problems to catch that.
+            problems_before = pip_check_problems()
+            batch_success = run_command(
+                pip_install_command("--no-input", "--no-deps", "--only-binary=:all:", "-r", lock_path),
+                "Installing core packages from lock file"
+            )
+            if not batch_success:
+                print("⚠️ Lock file failed to install, discarding it")
+                os.remove(lock_path)
+            elif pip_check_problems() - problems_before:
+                print("⚠️ Lock file no longer matches this environment, re-resolving")
+                os.remove(lock_path)
+                batch_success = False
+        
+        # Install core packages in a single resolver run
+        if not batch_success:
+            batch_success = run_with_backoff(lambda: run_command(
+                pip_install_command("--no-input", "--only-binary=:all:", *missing),
+                "Installing core packages"
+            ))
+    
+    return [] if batch_success else missing
+
+def install_source_packages(missing):
+    """Install packages that may need compiling - run only once the apt toolchain is in place"""
+    # Fall back to one package at a time so a single failure doesn't block the rest
+    for package in missing:
         run_command(
-            [sys.executable, "-m", "pip", "install", package],
+            pip_install_command("--prefer-binary", package),
             f"Installing {package}"
         )
     
     # Try to install TA-Lib (may fail, but we have fallbacks)
     print("🔄 Attempting to install TA-Lib...")
+    # Prefer a prebuilt wheel; only fall back to a source build when none matches
     talib_success = run_command(
-        [sys.executable, "-m", "pip", "install", "TA-Lib"],
-        "Installing TA-Lib",
-        check=False
+        pip_install_command("--only-binary=:all:", "--prefer-binary", "TA-Lib"),
+        "Installing TA-Lib wheel"
     )
+    if not talib_success:
+        talib_success = run_command(
+            pip_install_command("TA-Lib"),
+            "Building TA-Lib from source",
+            stream=True
+        )
     
     if not talib_success:
         print("⚠️ TA-Lib installation failed, will use basic indicators")
     
+    # Import the heavy packages once so their shared libraries are in the page
+    # cache before Streamlit's first run
+    run_command(
+        [sys.executable, "-c", "import pandas, numpy, plotly, sklearn, streamlit"],
+        "Warming package imports",
+        check=False
+    )
+    
     return True
 
 def install_mt5_linux():
@@ -93,12 +332,16 @@ def install_mt5_linux():
         "mt5linux"
     ]
     
+    # The candidates are alternatives - nothing to do if one is already present
+    if len(missing_requirements(mt5_packages)) < len(mt5_packages):
+        print("✅ MT5 Linux support already installed")
+        return True
+    
     mt5_installed = False
     for package in mt5_packages:
         success = run_command(
-            [sys.executable, "-m", "pip", "install", package],
-            f"Installing {package}",
-            check=False
+            pip_install_command("--no-input", "--prefer-binary", package),
+            f"Installing {package}"
         )
         if success:
             mt5_installed = True
@@ -108,7 +351,7 @@ def install_mt5_linux():
         print("⚠️ Failed to install MT5 Linux packages")
         print("🔧 Installing MetaTrader5 package directly...")
         run_command(
-            [sys.executable, "-m", "pip", "install", "MetaTrader5"],
+            pip_install_command("--no-input", "--prefer-binary", "MetaTrader5"),
             "Installing MetaTrader5 package",
             check=False
         )
@@ -129,12 +372,17 @@ def setup_wine_environment():
     for key, value in wine_env.items():
         os.environ[key] = value
     
+    if shutil.which("winecfg") is None:
+        print("⚠️ winecfg not found, skipping Wine initialization")
+        return False
+    
     # Initialize Wine (minimal setup)
     run_command(
         ["winecfg"],
         "Initializing Wine configuration",
         check=False,
-        shell=True
+        shell=True,
+        stream=True
     )
     
     return True
@@ -146,13 +394,38 @@ def download_mt5_terminal():
     mt5_url = "https://download.mql5.com/cdn/web/metaquotes.software.corp/mt5/mt5setup.exe"
     mt5_file = "/content/mt5setup.exe"
     
+    if os.path.exists(mt5_file) and os.path.getsize(mt5_file) > 0:
+        print("✅ MT5 terminal already downloaded")
+        return True
+    
+    # Download to a temporary name so an interrupted run never leaves a
+    # truncated installer that the check above would accept
+    partial_file = mt5_file + ".part"
+    
+    # Native downloaders copy straight to disk (aria2c also splits the
+    # transfer across connections); fall back to requests without them
+    download_commands = []
+    if shutil.which("aria2c"):
+        download_commands.append([
+            "aria2c", "-x", "8", "-s", "8", "--allow-overwrite=true",
+            "-d", os.path.dirname(partial_file), "-o", os.path.basename(partial_file), mt5_url
+        ])
+    if shutil.which("curl"):
+        download_commands.append(["curl", "-L", "--fail", "--silent", "--show-error", "-o", partial_file, mt5_url])
+    
+    for cmd in download_commands:
+        if run_command(cmd, f"Downloading with {cmd[0]}"):
+            os.replace(partial_file, mt5_file)
+            print("✅ MT5 terminal downloaded")
+            return True
+    
     try:
-        response = requests.get(mt5_url, stream=True)
-        response.raise_for_status()
-        
-        with open(mt5_file, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with requests.get(mt5_url, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            with open(partial_file, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+        os.replace(partial_file, mt5_file)
         
         print("✅ MT5 terminal downloaded")
         return True
@@ -161,6 +434,14 @@ def download_mt5_terminal():
         print(f"❌ Failed to download MT5 terminal: {e}")
         return False
 
+def write_if_changed(path, content):
+    """Write a generated file, leaving it untouched when the content is identical"""
+    path = Path(path)
+    if path.exists() and path.read_text() == content:
+        return False
+    path.write_text(content)
+    return True
+
 def create_test_script():
     """Create a test script to verify installation"""
     test_script = """
@@ -224,8 +505,7 @@ print(f"   MT5 Package Available: {MT5_AVAILABLE}")
 print("=" * 50)
 """
     
-    with open("/content/test_installation.py", "w") as f:
-        f.write(test_script)
+    write_if_changed("/content/test_installation.py", test_script)
     
     print("✅ Test script created at /content/test_installation.py")
 
@@ -282,8 +562,7 @@ if __name__ == "__main__":
     main()
 """
     
-    with open("/content/start_btc_analyzer.py", "w") as f:
-        f.write(launcher_script)
+    write_if_changed("/content/start_btc_analyzer.py", launcher_script)
     
     # Make it executable
     os.chmod("/content/start_btc_analyzer.py", 0o755)
@@ -294,27 +573,35 @@ def main():
     print("🚀 BTC Analyzer - Colab Setup Script")
     print("=" * 50)
     
-    # Check if running in Colab
+    # Check if running in Colab (locate the module without importing it)
     try:
-        import google.colab
+        in_colab = importlib.util.find_spec("google.colab") is not None
+    except ModuleNotFoundError:
+        in_colab = False
+    
+    if in_colab:
         print("✅ Running in Google Colab")
-    except ImportError:
+    else:
         print("⚠️ Not running in Google Colab, continuing anyway...")
     
-    # Install system dependencies
-    install_system_dependencies()
-    
-    # Install Python packages
-    install_python_packages()
-    
-    # Install MT5 Linux support
-    install_mt5_linux()
-    
-    # Setup Wine environment
-    setup_wine_environment()
-    
-    # Download MT5 terminal (optional)
-    download_mt5_terminal()
+    # Persistent pip cache for all installs below
+    configure_pip_cache()
+    
+    # The apt install, the wheel-only core pip install and the MT5 terminal
+    # download don't depend on each other, so overlap them. Anything that may
+    # compile (per-package fallback, TA-Lib, MT5 bridge) waits for apt's
+    # build toolchain, and pip never runs twice at once.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        system_deps = executor.submit(install_system_dependencies)
+        core_packages = executor.submit(install_python_packages)
+        mt5_download = executor.submit(run_with_backoff, download_mt5_terminal)  # optional
+        
+        system_deps.result()
+        setup_wine_environment()
+        
+        install_source_packages(core_packages.result())
+        install_mt5_linux()
+        mt5_download.result()
     
     # Create test and launcher scripts
     create_test_script()
@@ -14,6 +14,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import time
+import hashlib
 from datetime import datetime, timedelta
 import warnings
 import platform
@@ -45,6 +46,9 @@ except ImportError:
     HAS_TALIB = False
     st.info("⚡ Using built-in indicators (TA-Lib not available)")
 
+# Compiled fallback kernels (numba when installed, pure Python otherwise)
+from utils_njit import _ema, _rsi, _bbands, _stoch
+
 # Basic technical indicators for fallback
 def calculate_sma(data, window):
     """Simple Moving Average"""
@@ -52,28 +56,25 @@ def calculate_sma(data, window):
 
 def calculate_ema(data, window):
     """Exponential Moving Average"""
-    return data.ewm(span=window).mean()
+    values = _ema(data.to_numpy(dtype=np.float64), window)
+    return pd.Series(values, index=data.index)
 
 def calculate_rsi(data, window=14):
-    """Relative Strength Index"""
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+    """Relative Strength Index (Wilder's smoothing)"""
+    values = _rsi(data.to_numpy(dtype=np.float64), window)
+    return pd.Series(values, index=data.index)
 
 def calculate_bollinger_bands(data, window=20, num_std=2):
     """Bollinger Bands"""
-    rolling_mean = data.rolling(window=window).mean()
-    rolling_std = data.rolling(window=window).std()
-    upper_band = rolling_mean + (rolling_std * num_std)
-    lower_band = rolling_mean - (rolling_std * num_std)
-    return upper_band, rolling_mean, lower_band
+    upper, middle, lower = _bbands(data.to_numpy(dtype=np.float64), window, float(num_std))
+    return (
+        pd.Series(upper, index=data.index),
+        pd.Series(middle, index=data.index),
+        pd.Series(lower, index=data.index)
+    )
 
-def calculate_macd(data, fast=12, slow=26, signal=9):
-    """MACD Indicator"""
-    ema_fast = calculate_ema(data, fast)
-    ema_slow = calculate_ema(data, slow)
+def calculate_macd(ema_fast, ema_slow, signal=9):
+    """MACD Indicator from precomputed fast/slow EMAs"""
     macd = ema_fast - ema_slow
     macd_signal = calculate_ema(macd, signal)
     macd_histogram = macd - macd_signal
@@ -81,13 +82,23 @@ def calculate_macd(data, fast=12, slow=26, signal=9):
 
 def calculate_stochastic(high, low, close, k_window=14, d_window=3):
     """Stochastic Oscillator"""
-    lowest_low = low.rolling(window=k_window).min()
-    highest_high = high.rolling(window=k_window).max()
-    k_percent = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-    d_percent = k_percent.rolling(window=d_window).mean()
-    return k_percent, d_percent
+    k_percent, d_percent = _stoch(
+        high.to_numpy(dtype=np.float64),
+        low.to_numpy(dtype=np.float64),
+        close.to_numpy(dtype=np.float64),
+        k_window,
+        d_window
+    )
+    return pd.Series(k_percent, index=close.index), pd.Series(d_percent, index=close.index)
+
+def format_metric(value, fmt: str, prefix: str = "") -> str:
+    """Format a metric value, showing N/A for missing or not-yet-warmed-up values"""
+    if value is None or np.isnan(value):
+        return "N/A"
+    return f"{prefix}{value:{fmt}}"
 
 # Generate demo data when MT5 is not available
+@st.cache_data(ttl=60, show_spinner=False)
 def generate_demo_bitcoin_data(days=30):
     """Generate realistic demo Bitcoin data"""
     np.random.seed(42)  # For reproducible demo data
@@ -96,44 +107,30 @@ def generate_demo_bitcoin_data(days=30):
     end_time = datetime.now()
     start_time = end_time - timedelta(days=days)
     hours = int((end_time - start_time).total_seconds() / 3600)
-    times = [start_time + timedelta(hours=i) for i in range(hours)]
+    times = pd.date_range(start=start_time, periods=hours, freq=pd.Timedelta(hours=1), name='time')
     
     # Generate realistic Bitcoin price movements (random walk with trend)
     start_price = 45000.0
-    prices = []
-    current_price = start_price
+    trend = 0.0001  # Slight upward trend
+    volatility = 0.02  # 2% volatility
+    changes = np.random.normal(trend, volatility, hours)
+    prices = start_price * np.cumprod(1 + changes)
     
-    for i in range(hours):
-        # Bitcoin-like volatility and trend
-        trend = 0.0001  # Slight upward trend
-        volatility = 0.02  # 2% volatility
-        
-        change = np.random.normal(trend, volatility)
-        current_price *= (1 + change)
-        prices.append(current_price)
+    # Generate realistic OHLC from price
+    intraday_volatility = prices * 0.005  # 0.5% intraday volatility
+    high = prices + np.random.uniform(0, intraday_volatility)
+    low = prices - np.random.uniform(0, intraday_volatility)
+    open_prices = np.concatenate((prices[:1], prices[:-1]))
+    volume = np.random.randint(1000, 10000, hours)
     
-    # Create OHLCV data
-    data = []
-    for i, (time, price) in enumerate(zip(times, prices)):
-        # Generate realistic OHLC from price
-        volatility = price * 0.005  # 0.5% intraday volatility
-        high = price + np.random.uniform(0, volatility)
-        low = price - np.random.uniform(0, volatility)
-        open_price = prices[i-1] if i > 0 else price
-        close_price = price
-        volume = np.random.randint(1000, 10000)
-        
-        data.append({
-            'time': time,
-            'Open': open_price,
-            'High': max(open_price, high, close_price),
-            'Low': min(open_price, low, close_price),
-            'Close': close_price,
-            'Volume': volume
-        })
-    
-    df = pd.DataFrame(data)
-    df.set_index('time', inplace=True)
+    # Build the frame once from typed arrays
+    df = pd.DataFrame({
+        'Open': open_prices,
+        'High': np.maximum(np.maximum(open_prices, high), prices),
+        'Low': np.minimum(np.minimum(open_prices, low), prices),
+        'Close': prices,
+        'Volume': volume
+    }, index=times)
     
     return df
 
@@ -171,6 +168,41 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Bars recomputed ahead of the first changed bar on incremental updates so
+# recursive indicators (EMA, RSI, MACD, ADX) converge to full-history values
+INDICATOR_WARMUP_BARS = 250
+
+# Upper bound on the rows used to fit the direction model
+MAX_TRAINING_ROWS = 2000
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _fit_direction_model(features_hash: str, _features, _target):
+    """Fit scaler and classifier, cached on the hash of the training data"""
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        _features, _target, test_size=0.2, random_state=42, stratify=_target
+    )
+    
+    # Scale features
+    scaler = StandardScaler(copy=False)
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
+    # Train model
+    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(X_train_scaled, y_train)
+    
+    # Evaluate model
+    train_score = model.score(X_train_scaled, y_train)
+    test_score = model.score(X_test_scaled, y_test)
+    
+    return model, scaler, train_score, test_score
+
+@st.cache_data(ttl=1, show_spinner=False)
+def _cached_current_price(provider_id: int, symbol: str, _provider):
+    """Current quote for a symbol, shared by reruns within the same second"""
+    return _provider.get_current_price(symbol)
+
 class MetaTraderBitcoinAnalyzer:
     """
     Enhanced Bitcoin analyzer with MetaTrader 5 integration
@@ -181,8 +213,11 @@ class MetaTraderBitcoinAnalyzer:
         self.current_symbol = None
         self.current_timeframe = None
         self.data = pd.DataFrame()
+        self.features = pd.DataFrame()  # ML features for self.data, built once per load
         self.model = None
         self.scaler = None
+        self.indicator_cache = {}  # (symbol, timeframe) -> DataFrame with indicators
+        self.indicator_cache_generation = None  # provider connection the cache belongs to
         
     def initialize_mt5_connection(self):
         """Initialize MetaTrader 5 connection with error handling"""
@@ -225,38 +260,54 @@ class MetaTraderBitcoinAnalyzer:
             return df
         
         try:
+            # Pull the OHLCV columns out once as contiguous float64 arrays
+            close = df['Close'].to_numpy(dtype=np.float64)
+            high = df['High'].to_numpy(dtype=np.float64)
+            low = df['Low'].to_numpy(dtype=np.float64)
+            volume = df['Volume'].to_numpy(dtype=np.float64)
+            
+            indicators = {}
+            
             # Use TA-Lib if available, otherwise use basic indicators
             if HAS_TALIB:
                 # TA-Lib indicators
-                df['SMA_20'] = talib.SMA(df['Close'], timeperiod=20)
-                df['SMA_50'] = talib.SMA(df['Close'], timeperiod=50)
-                df['EMA_12'] = talib.EMA(df['Close'], timeperiod=12)
-                df['EMA_26'] = talib.EMA(df['Close'], timeperiod=26)
-                df['RSI'] = talib.RSI(df['Close'], timeperiod=14)
-                df['MACD'], df['MACD_signal'], df['MACD_histogram'] = talib.MACD(df['Close'])
-                df['BB_upper'], df['BB_middle'], df['BB_lower'] = talib.BBANDS(df['Close'])
-                df['ATR'] = talib.ATR(df['High'], df['Low'], df['Close'], timeperiod=14)
-                df['ADX'] = talib.ADX(df['High'], df['Low'], df['Close'], timeperiod=14)
-                df['CCI'] = talib.CCI(df['High'], df['Low'], df['Close'], timeperiod=14)
-                df['MFI'] = talib.MFI(df['High'], df['Low'], df['Close'], df['Volume'], timeperiod=14)
-                df['WILLR'] = talib.WILLR(df['High'], df['Low'], df['Close'], timeperiod=14)
-                df['STOCH_K'], df['STOCH_D'] = talib.STOCH(df['High'], df['Low'], df['Close'])
+                indicators['SMA_20'] = talib.SMA(close, timeperiod=20)
+                indicators['SMA_50'] = talib.SMA(close, timeperiod=50)
+                indicators['EMA_12'] = talib.EMA(close, timeperiod=12)
+                indicators['EMA_26'] = talib.EMA(close, timeperiod=26)
+                indicators['RSI'] = talib.RSI(close, timeperiod=14)
+                indicators['MACD'], indicators['MACD_signal'], indicators['MACD_histogram'] = talib.MACD(close)
+                indicators['BB_upper'], indicators['BB_middle'], indicators['BB_lower'] = talib.BBANDS(close)
+                indicators['ATR'] = talib.ATR(high, low, close, timeperiod=14)
+                indicators['ADX'] = talib.ADX(high, low, close, timeperiod=14)
+                indicators['CCI'] = talib.CCI(high, low, close, timeperiod=14)
+                indicators['MFI'] = talib.MFI(high, low, close, volume, timeperiod=14)
+                indicators['WILLR'] = talib.WILLR(high, low, close, timeperiod=14)
+                indicators['STOCH_K'], indicators['STOCH_D'] = talib.STOCH(high, low, close)
             else:
                 # Basic indicators
-                df['SMA_20'] = calculate_sma(df['Close'], 20)
-                df['SMA_50'] = calculate_sma(df['Close'], 50)
-                df['EMA_12'] = calculate_ema(df['Close'], 12)
-                df['EMA_26'] = calculate_ema(df['Close'], 26)
-                df['RSI'] = calculate_rsi(df['Close'])
-                df['MACD'], df['MACD_signal'], df['MACD_histogram'] = calculate_macd(df['Close'])
-                df['BB_upper'], df['BB_middle'], df['BB_lower'] = calculate_bollinger_bands(df['Close'])
-                df['STOCH_K'], df['STOCH_D'] = calculate_stochastic(df['High'], df['Low'], df['Close'])
+                indicators['SMA_20'] = calculate_sma(df['Close'], 20)
+                indicators['SMA_50'] = calculate_sma(df['Close'], 50)
+                indicators['EMA_12'] = calculate_ema(df['Close'], 12)
+                indicators['EMA_26'] = calculate_ema(df['Close'], 26)
+                indicators['RSI'] = calculate_rsi(df['Close'])
+                indicators['MACD'], indicators['MACD_signal'], indicators['MACD_histogram'] = calculate_macd(
+                    indicators['EMA_12'], indicators['EMA_26']
+                )
+                indicators['BB_upper'], indicators['BB_middle'], indicators['BB_lower'] = calculate_bollinger_bands(df['Close'])
+                indicators['STOCH_K'], indicators['STOCH_D'] = calculate_stochastic(df['High'], df['Low'], df['Close'])
             
             # Additional calculated indicators
-            df['Price_Change'] = df['Close'].pct_change()
-            df['Volume_SMA'] = df['Volume'].rolling(window=20).mean()
-            df['High_Low_Ratio'] = df['High'] / df['Low']
-            df['Price_Range'] = df['High'] - df['Low']
+            price_change = np.empty_like(close)
+            price_change[0] = np.nan
+            price_change[1:] = close[1:] / close[:-1] - 1
+            indicators['Price_Change'] = price_change
+            indicators['Volume_SMA'] = calculate_sma(df['Volume'], 20)
+            indicators['High_Low_Ratio'] = high / low
+            indicators['Price_Range'] = high - low
+            
+            # Attach every indicator column in a single pass
+            df = df.assign(**indicators)
             
             return df
             
@@ -264,6 +315,49 @@ class MetaTraderBitcoinAnalyzer:
             st.error(f"Error adding technical indicators: {str(e)}")
             return df
     
+    def update_technical_indicators(self, df, symbol: str, timeframe: str):
+        """Add technical indicators, reusing cached rows for bars already processed"""
+        if df.empty:
+            return df
+        
+        # Bars from a previous connection (possibly another server) can't be reused
+        generation = getattr(self.mt5_provider, 'connection_generation', None)
+        if generation != self.indicator_cache_generation:
+            self.indicator_cache.clear()
+            self.indicator_cache_generation = generation
+        
+        key = (symbol, timeframe)
+        cached = self.indicator_cache.get(key)
+        
+        # Locate the cached bars that overlap the start of the new window
+        overlap = None
+        if cached is not None and not cached.empty:
+            pos = cached.index.get_indexer([df.index[0]])[0]
+            if pos != -1:
+                overlap = cached.index[pos:]
+                if len(overlap) > len(df) or not overlap.equals(df.index[:len(overlap)]):
+                    overlap = None
+        
+        # The last cached bar may still have been forming, so recompute from it.
+        # Earlier bars are only reused if their prices are unchanged (brokers
+        # can revise history), otherwise the stale OHLCV would be returned.
+        if overlap is not None:
+            split = len(overlap) - 1
+            ohlcv = ['Open', 'High', 'Low', 'Close', 'Volume']
+            if not cached[ohlcv].iloc[pos:pos + split].equals(df[ohlcv].iloc[:split]):
+                overlap = None
+        
+        if overlap is None:
+            # No cache, a gap between windows or revised bars - full recompute
+            result = self.add_technical_indicators(df)
+        else:
+            start = max(0, split - INDICATOR_WARMUP_BARS)
+            tail = self.add_technical_indicators(df.iloc[start:])
+            result = pd.concat([cached.iloc[pos:pos + split], tail.iloc[split - start:]])
+        
+        self.indicator_cache[key] = result
+        return result
+    
     def create_features_for_ml(self, df):
         """Create features for machine learning"""
         if df.empty:
@@ -283,7 +377,14 @@ class MetaTraderBitcoinAnalyzer:
             features['rsi'] = df['RSI']
             features['macd'] = df['MACD']
             features['macd_signal'] = df['MACD_signal']
-            features['bb_position'] = (df['Close'] - df['BB_lower']) / (df['BB_upper'] - df['BB_lower'])
+            # Position of close inside the band; flat bands map to the midpoint
+            bb_lower = df['BB_lower'].to_numpy()
+            bb_range = df['BB_upper'].to_numpy() - bb_lower
+            features['bb_position'] = np.where(
+                bb_range != 0,
+                (df['Close'].to_numpy() - bb_lower) / bb_range,
+                0.5
+            )
             features['sma_20'] = df['SMA_20']
             features['sma_50'] = df['SMA_50']
             features['ema_12'] = df['EMA_12']
@@ -310,41 +411,34 @@ class MetaTraderBitcoinAnalyzer:
             st.error(f"Error creating ML features: {str(e)}")
             return pd.DataFrame()
     
-    def train_ml_model(self, df):
+    def train_ml_model(self, df, features=None):
         """Train machine learning model for price prediction"""
         if df.empty:
             return None, None
         
         try:
-            # Create features
-            features = self.create_features_for_ml(df)
+            # Create features unless the caller already has them
+            if features is None:
+                features = self.create_features_for_ml(df)
             if features.empty:
                 return None, None
             
             # Create target (next period's price direction)
             target = (features['close'].shift(-1) > features['close']).astype(int)
             
-            # Align features and target
-            features = features[:-1]  # Remove last row (no target)
-            target = target[:-1]      # Remove last row (NaN)
+            # Align features and target; trees split on float32 internally,
+            # so hand sklearn a contiguous float32 matrix up front
+            X = np.ascontiguousarray(features.to_numpy(dtype=np.float32)[:-1])  # Remove last row (no target)
+            y = target.to_numpy()[:-1]  # Remove last row (NaN)
             
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                features, target, test_size=0.2, random_state=42, stratify=target
-            )
+            # Fit on the most recent bars only; older history adds fit time
+            # but little signal for a non-stationary price series
+            X = X[-MAX_TRAINING_ROWS:]
+            y = y[-MAX_TRAINING_ROWS:]
             
-            # Scale features
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
-            
-            # Train model
-            model = RandomForestClassifier(n_estimators=100, random_state=42)
-            model.fit(X_train_scaled, y_train)
-            
-            # Evaluate model
-            train_score = model.score(X_train_scaled, y_train)
-            test_score = model.score(X_test_scaled, y_test)
+            # Fit (or reuse the cached fit for identical training data)
+            features_hash = hashlib.sha1(X.tobytes() + y.tobytes()).hexdigest()
+            model, scaler, train_score, test_score = _fit_direction_model(features_hash, X, y)
             
             st.info(f"Model trained - Train accuracy: {train_score:.3f}, Test accuracy: {test_score:.3f}")
             
@@ -354,19 +448,20 @@ class MetaTraderBitcoinAnalyzer:
             st.error(f"Error training ML model: {str(e)}")
             return None, None
     
-    def predict_price_direction(self, df, model, scaler):
+    def predict_price_direction(self, df, model, scaler, features=None):
         """Predict next price direction"""
         if df.empty or model is None or scaler is None:
             return None
         
         try:
-            # Create features for the latest data point
-            features = self.create_features_for_ml(df)
+            # Create features for the latest data point unless already computed
+            if features is None:
+                features = self.create_features_for_ml(df)
             if features.empty:
                 return None
             
             # Get the latest features
-            latest_features = features.iloc[-1:].values
+            latest_features = features.to_numpy(dtype=np.float32)[-1:]
             
             # Scale features
             latest_features_scaled = scaler.transform(latest_features)
@@ -400,67 +495,48 @@ class MetaTraderBitcoinAnalyzer:
                 row_heights=[0.5, 0.2, 0.15, 0.15]
             )
             
-            # Candlestick chart
-            fig.add_trace(
-                go.Candlestick(
-                    x=df.index,
-                    open=df['Open'],
-                    high=df['High'],
-                    low=df['Low'],
-                    close=df['Close'],
-                    name='Price'
-                ),
-                row=1, col=1
-            )
-            
-            # Add moving averages
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['SMA_20'], name='SMA 20', line=dict(color='orange')),
-                row=1, col=1
-            )
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['SMA_50'], name='SMA 50', line=dict(color='red')),
-                row=1, col=1
-            )
+            # Convert the shared x axis and OHLC columns to ndarrays once
+            x = df.index.to_numpy()
+            open_prices = df['Open'].to_numpy()
+            close_prices = df['Close'].to_numpy()
             
-            # Bollinger Bands
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['BB_upper'], name='BB Upper', line=dict(color='gray', dash='dash')),
-                row=1, col=1
-            )
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['BB_lower'], name='BB Lower', line=dict(color='gray', dash='dash')),
-                row=1, col=1
-            )
-            
-            # Volume
-            fig.add_trace(
-                go.Bar(x=df.index, y=df['Volume'], name='Volume', marker_color='lightblue'),
-                row=2, col=1
-            )
-            
-            # RSI
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['RSI'], name='RSI', line=dict(color='purple')),
-                row=3, col=1
-            )
+            # Candlestick chart
+            traces = [go.Candlestick(
+                x=x,
+                open=open_prices,
+                high=df['High'].to_numpy(),
+                low=df['Low'].to_numpy(),
+                close=close_prices,
+                name='Price'
+            )]
+            rows = [1]
+            
+            # Indicator overlays: (column, trace name, trace type, style, row)
+            overlays = [
+                ('SMA_20', 'SMA 20', go.Scatter, dict(line=dict(color='orange')), 1),
+                ('SMA_50', 'SMA 50', go.Scatter, dict(line=dict(color='red')), 1),
+                ('BB_upper', 'BB Upper', go.Scatter, dict(line=dict(color='gray', dash='dash')), 1),
+                ('BB_lower', 'BB Lower', go.Scatter, dict(line=dict(color='gray', dash='dash')), 1),
+                # Volume (green on up bars, red on down bars)
+                ('Volume', 'Volume', go.Bar,
+                 dict(marker_color=np.where(close_prices >= open_prices, '#00ff88', '#ff4444')), 2),
+                ('RSI', 'RSI', go.Scatter, dict(line=dict(color='purple')), 3),
+                ('MACD', 'MACD', go.Scatter, dict(line=dict(color='blue')), 4),
+                ('MACD_signal', 'Signal', go.Scatter, dict(line=dict(color='red')), 4),
+                ('MACD_histogram', 'Histogram', go.Bar, dict(marker_color='gray'), 4),
+            ]
+            for column, name, trace_type, style, row in overlays:
+                if column in df.columns:
+                    traces.append(trace_type(x=x, y=df[column].to_numpy(), name=name, **style))
+                    rows.append(row)
+            
+            # Add every trace in one batch
+            fig.add_traces(traces, rows=rows, cols=[1] * len(rows))
+            
+            # RSI overbought / oversold levels
             fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
             fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
             
-            # MACD
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['MACD'], name='MACD', line=dict(color='blue')),
-                row=4, col=1
-            )
-            fig.add_trace(
-                go.Scatter(x=df.index, y=df['MACD_signal'], name='Signal', line=dict(color='red')),
-                row=4, col=1
-            )
-            fig.add_trace(
-                go.Bar(x=df.index, y=df['MACD_histogram'], name='Histogram', marker_color='gray'),
-                row=4, col=1
-            )
-            
             # Update layout
             fig.update_layout(
                 title=f'{self.current_symbol} - {self.current_timeframe} Analysis',
@@ -475,6 +551,21 @@ class MetaTraderBitcoinAnalyzer:
             st.error(f"Error creating chart: {str(e)}")
             return None
 
+def _fragment(func):
+    """Run func as a Streamlit fragment when supported (Streamlit >= 1.33)"""
+    fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+    return fragment(func) if fragment else func
+
+@_fragment
+def render_chart_panel(analyzer):
+    """Chart panel; changing its controls reruns only this panel, not the whole app"""
+    # Bars drawn on the chart (indicators and the model still use the full history)
+    display_limit = st.slider("Chart Bars", min_value=50, max_value=1000, value=300, step=50)
+    
+    chart = analyzer.create_candlestick_chart(analyzer.data.tail(display_limit))
+    if chart:
+        st.plotly_chart(chart, use_container_width=True)
+
 def main():
     st.markdown("<h1 class='main-header'>₿ Bitcoin Live Analyzer & Predictor - MT5 Edition</h1>", unsafe_allow_html=True)
     
@@ -554,12 +645,13 @@ def main():
                     
                     if not df.empty:
                         # Add technical indicators
-                        df = analyzer.add_technical_indicators(df)
+                        df = analyzer.update_technical_indicators(df, selected_symbol, timeframe)
                         analyzer.data = df
+                        analyzer.features = analyzer.create_features_for_ml(df)
                         
                         # Train ML model
                         with st.spinner("Training ML model..."):
-                            model, scaler = analyzer.train_ml_model(df)
+                            model, scaler = analyzer.train_ml_model(df, analyzer.features)
                             analyzer.model = model
                             analyzer.scaler = scaler
                         
@@ -568,7 +660,9 @@ def main():
             # Display data if available
             if not analyzer.data.empty:
                 # Current price info
-                current_price = analyzer.mt5_provider.get_current_price(selected_symbol)
+                current_price = _cached_current_price(
+                    id(analyzer.mt5_provider), selected_symbol, analyzer.mt5_provider
+                )
                 if current_price:
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
@@ -582,7 +676,9 @@ def main():
                 
                 # ML Prediction
                 if analyzer.model and analyzer.scaler:
-                    prediction = analyzer.predict_price_direction(analyzer.data, analyzer.model, analyzer.scaler)
+                    prediction = analyzer.predict_price_direction(
+                        analyzer.data, analyzer.model, analyzer.scaler, analyzer.features
+                    )
                     if prediction:
                         st.markdown(f"""
                         <div class="prediction-box">
@@ -593,9 +689,7 @@ def main():
                         """, unsafe_allow_html=True)
                 
                 # Chart
-                chart = analyzer.create_candlestick_chart(analyzer.data)
-                if chart:
-                    st.plotly_chart(chart, use_container_width=True)
+                render_chart_panel(analyzer)
                 
                 # Technical indicators summary
                 latest_data = analyzer.data.iloc[-1]
@@ -603,25 +697,27 @@ def main():
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.subheader("📊 Technical Indicators")
-                    st.metric("RSI", f"{latest_data['RSI']:.2f}")
-                    st.metric("MACD", f"{latest_data['MACD']:.5f}")
-                    st.metric("SMA 20", f"{latest_data['SMA_20']:.5f}")
+                    st.metric("RSI", format_metric(latest_data.get('RSI'), '.2f'))
+                    st.metric("MACD", format_metric(latest_data.get('MACD'), '.5f'))
+                    st.metric("SMA 20", format_metric(latest_data.get('SMA_20'), '.5f'))
                 
                 with col2:
                     st.subheader("📈 Moving Averages")
-                    st.metric("SMA 50", f"{latest_data['SMA_50']:.5f}")
-                    st.metric("EMA 12", f"{latest_data['EMA_12']:.5f}")
-                    st.metric("EMA 26", f"{latest_data['EMA_26']:.5f}")
+                    st.metric("SMA 50", format_metric(latest_data.get('SMA_50'), '.5f'))
+                    st.metric("EMA 12", format_metric(latest_data.get('EMA_12'), '.5f'))
+                    st.metric("EMA 26", format_metric(latest_data.get('EMA_26'), '.5f'))
                 
                 with col3:
                     st.subheader("🎯 Bollinger Bands")
-                    st.metric("Upper Band", f"{latest_data['BB_upper']:.5f}")
-                    st.metric("Middle Band", f"{latest_data['BB_middle']:.5f}")
-                    st.metric("Lower Band", f"{latest_data['BB_lower']:.5f}")
+                    st.metric("Upper Band", format_metric(latest_data.get('BB_upper'), '.5f'))
+                    st.metric("Middle Band", format_metric(latest_data.get('BB_middle'), '.5f'))
+                    st.metric("Lower Band", format_metric(latest_data.get('BB_lower'), '.5f'))
                 
                 # Raw data
-                with st.expander("📋 Raw Data"):
-                    st.dataframe(analyzer.data.tail(100))
+                # st.expander serializes its body on every rerun even when collapsed,
+                # so only build the table once the user asks for it
+                if st.checkbox("📋 Show Raw Data"):
+                    st.dataframe(analyzer.data.iloc[-100:])
         
         # Account info
         if MT5_INTEGRATION_AVAILABLE:
@@ -643,10 +739,11 @@ def main():
                     # Add technical indicators
                     df = analyzer.add_technical_indicators(df)
                     analyzer.data = df
+                    analyzer.features = analyzer.create_features_for_ml(df)
                     
                     # Train ML model
                     with st.spinner("Training ML model..."):
-                        model, scaler = analyzer.train_ml_model(df)
+                        model, scaler = analyzer.train_ml_model(df, analyzer.features)
                         analyzer.model = model
                         analyzer.scaler = scaler
                     
@@ -659,17 +756,19 @@ def main():
             latest_data = analyzer.data.iloc[-1]
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Demo Price", f"${latest_data['Close']:.2f}")
+                st.metric("Demo Price", format_metric(latest_data.get('Close'), '.2f', prefix='$'))
             with col2:
-                st.metric("High", f"${latest_data['High']:.2f}")
+                st.metric("High", format_metric(latest_data.get('High'), '.2f', prefix='$'))
             with col3:
-                st.metric("Low", f"${latest_data['Low']:.2f}")
+                st.metric("Low", format_metric(latest_data.get('Low'), '.2f', prefix='$'))
             with col4:
-                st.metric("Volume", f"{latest_data['Volume']:,.0f}")
+                st.metric("Volume", format_metric(latest_data.get('Volume'), ',.0f'))
             
             # ML Prediction
             if analyzer.model and analyzer.scaler:
-                prediction = analyzer.predict_price_direction(analyzer.data, analyzer.model, analyzer.scaler)
+                prediction = analyzer.predict_price_direction(
+                    analyzer.data, analyzer.model, analyzer.scaler, analyzer.features
+                )
                 if prediction:
                     st.markdown(f"""
                     <div class="prediction-box">
@@ -680,33 +779,31 @@ def main():
                     """, unsafe_allow_html=True)
             
             # Chart
-            chart = analyzer.create_candlestick_chart(analyzer.data)
-            if chart:
-                st.plotly_chart(chart, use_container_width=True)
+            render_chart_panel(analyzer)
             
             # Technical indicators summary
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.subheader("📊 Technical Indicators")
-                st.metric("RSI", f"{latest_data['RSI']:.2f}")
-                st.metric("MACD", f"{latest_data['MACD']:.5f}")
-                st.metric("SMA 20", f"${latest_data['SMA_20']:.2f}")
+                st.metric("RSI", format_metric(latest_data.get('RSI'), '.2f'))
+                st.metric("MACD", format_metric(latest_data.get('MACD'), '.5f'))
+                st.metric("SMA 20", format_metric(latest_data.get('SMA_20'), '.2f', prefix='$'))
             
             with col2:
                 st.subheader("📈 Moving Averages") 
-                st.metric("SMA 50", f"${latest_data['SMA_50']:.2f}")
-                st.metric("EMA 12", f"${latest_data['EMA_12']:.2f}")
-                st.metric("EMA 26", f"${latest_data['EMA_26']:.2f}")
+                st.metric("SMA 50", format_metric(latest_data.get('SMA_50'), '.2f', prefix='$'))
+                st.metric("EMA 12", format_metric(latest_data.get('EMA_12'), '.2f', prefix='$'))
+                st.metric("EMA 26", format_metric(latest_data.get('EMA_26'), '.2f', prefix='$'))
             
             with col3:
                 st.subheader("🎯 Bollinger Bands")
-                st.metric("Upper Band", f"${latest_data['BB_upper']:.2f}")
-                st.metric("Middle Band", f"${latest_data['BB_middle']:.2f}")
-                st.metric("Lower Band", f"${latest_data['BB_lower']:.2f}")
+                st.metric("Upper Band", format_metric(latest_data.get('BB_upper'), '.2f', prefix='$'))
+                st.metric("Middle Band", format_metric(latest_data.get('BB_middle'), '.2f', prefix='$'))
+                st.metric("Lower Band", format_metric(latest_data.get('BB_lower'), '.2f', prefix='$'))
             
             # Raw data
-            with st.expander("📋 Raw Data (Demo)"):
-                st.dataframe(analyzer.data.tail(100))
+            if st.checkbox("📋 Show Raw Data (Demo)"):
+                st.dataframe(analyzer.data.iloc[-100:])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
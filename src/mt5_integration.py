@@ -14,11 +14,20 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import time
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Storage dtypes for bar data. Prices stay float64: float32 only carries ~7
+# significant digits, which already rounds BTCUSD quotes (~1e5) by ~0.008
+OHLC_DTYPE = np.float64
+VOLUME_DTYPE = np.uint32
+
+# Symbol metadata (digits, point, lot limits) rarely changes within a session
+SYMBOL_INFO_TTL = 5.0  # seconds
+
 # Try to import MetaTrader5 with robust error handling
 MT5_AVAILABLE = False
 mt5 = None
@@ -33,6 +42,23 @@ except ImportError as e:
 except Exception as e:
     logger.error(f"❌ Unexpected error importing MetaTrader5: {str(e)}")
 
+# The MetaTrader5 binding makes no thread-safety guarantees, and Streamlit
+# sessions call it from several threads
+_MT5_LOCK = threading.RLock()
+
+# Map timeframe strings to MT5 constants (built once at import)
+_TF_MAP = {
+    'M1': mt5.TIMEFRAME_M1,
+    'M5': mt5.TIMEFRAME_M5,
+    'M15': mt5.TIMEFRAME_M15,
+    'M30': mt5.TIMEFRAME_M30,
+    'H1': mt5.TIMEFRAME_H1,
+    'H4': mt5.TIMEFRAME_H4,
+    'D1': mt5.TIMEFRAME_D1,
+    'W1': mt5.TIMEFRAME_W1,
+    'MN1': mt5.TIMEFRAME_MN1
+} if MT5_AVAILABLE else {}
+
 # Windows-specific MT5 path detection
 def detect_mt5_installation():
     """Detect MetaTrader 5 installation on Windows"""
@@ -71,6 +97,11 @@ class MetaTraderDataProvider:
         self.available_symbols = []
         self.account_info = None
         self.demo_mode = not MT5_AVAILABLE
+        self.connection_generation = 0  # bumped on every connect/disconnect
+        self._bar_cache = {}  # (symbol, timeframe) -> most recent bars fetched
+        self._symbol_info_cache = {}  # symbol -> (expiry time, info dict)
+        self._symbols_np = np.array([], dtype=str)
+        self._available_symbols_set = set()
         
         if not MT5_AVAILABLE:
             logger.info("🔄 Running in DEMO MODE - No MT5 connection available")
@@ -79,6 +110,7 @@ class MetaTraderDataProvider:
     def _setup_demo_data(self):
         """Setup demo data when MT5 is not available"""
         self.available_symbols = ['BTCUSD', 'EURUSD', 'GBPUSD', 'USDJPY', 'XAUUSD']
+        self._index_symbols()
         logger.info("📊 Demo symbols loaded: " + ", ".join(self.available_symbols))
         
     def initialize_mt5(self, login: int = None, password: str = None, server: str = None, path: str = None):
@@ -95,85 +127,112 @@ class MetaTraderDataProvider:
             logger.warning("⚠️ MT5 not available - staying in demo mode")
             return False
             
-        try:
-            # Windows-specific initialization
-            if platform.system() == "Windows":
-                if path:
-                    # Initialize with custom path
-                    if not mt5.initialize(path=path):
-                        logger.error(f"Failed to initialize MT5 with path: {path}")
-                        return False
-                else:
-                    # Auto-detect MT5 installation
-                    detected_path = detect_mt5_installation()
-                    if detected_path:
-                        logger.info(f"🔍 Detected MT5 installation: {detected_path}")
-                        if not mt5.initialize(path=detected_path):
-                            logger.error("Failed to initialize MT5 with detected path")
+        with _MT5_LOCK:
+            try:
+                # Windows-specific initialization
+                if platform.system() == "Windows":
+                    if path:
+                        # Initialize with custom path
+                        if not mt5.initialize(path=path):
+                            logger.error(f"Failed to initialize MT5 with path: {path}")
+                            return False
+                    else:
+                        # Auto-detect MT5 installation
+                        detected_path = detect_mt5_installation()
+                        if detected_path:
+                            logger.info(f"🔍 Detected MT5 installation: {detected_path}")
+                            if not mt5.initialize(path=detected_path):
+                                logger.error("Failed to initialize MT5 with detected path")
+                                # Try default initialization
+                                if not mt5.initialize():
+                                    logger.error("Failed to initialize MT5 (default)")
+                                    return False
+                        else:
                             # Try default initialization
                             if not mt5.initialize():
-                                logger.error("Failed to initialize MT5 (default)")
+                                logger.error("Failed to initialize MT5 (no path detected)")
                                 return False
-                    else:
-                        # Try default initialization
-                        if not mt5.initialize():
-                            logger.error("Failed to initialize MT5 (no path detected)")
-                            return False
-            else:
-                # Non-Windows initialization
-                if not mt5.initialize():
-                    logger.error("Failed to initialize MetaTrader 5")
-                    return False
+                else:
+                    # Non-Windows initialization
+                    if not mt5.initialize():
+                        logger.error("Failed to initialize MetaTrader 5")
+                        return False
             
-            # Check if MT5 terminal is running
-            terminal_info = mt5.terminal_info()
-            if terminal_info is None:
-                logger.error("MT5 terminal is not running or not accessible")
-                return False
+                # Check if MT5 terminal is running
+                terminal_info = mt5.terminal_info()
+                if terminal_info is None:
+                    logger.error("MT5 terminal is not running or not accessible")
+                    return False
                 
-            logger.info(f"✅ MT5 Terminal connected: {terminal_info.name}")
+                logger.info(f"✅ MT5 Terminal connected: {terminal_info.name}")
             
-            # Login if credentials provided
-            if login and password and server:
-                if not mt5.login(login, password, server):
-                    error_code = mt5.last_error()
-                    logger.error(f"Failed to login to MT5: {error_code}")
-                    return False
-                logger.info(f"✅ Logged in to server: {server}")
+                # Login if credentials provided
+                if login and password and server:
+                    if not mt5.login(login, password, server):
+                        error_code = mt5.last_error()
+                        logger.error(f"Failed to login to MT5: {error_code}")
+                        return False
+                    logger.info(f"✅ Logged in to server: {server}")
             
-            # Get account info
-            self.account_info = mt5.account_info()
-            if self.account_info is None:
-                logger.warning("⚠️ No account info available (demo account or not logged in)")
-                # Continue without account info for demo accounts
-            else:
-                logger.info(f"✅ Account connected: {self.account_info.login}")
+                # Get account info
+                self.account_info = mt5.account_info()
+                if self.account_info is None:
+                    logger.warning("⚠️ No account info available (demo account or not logged in)")
+                    # Continue without account info for demo accounts
+                else:
+                    logger.info(f"✅ Account connected: {self.account_info.login}")
             
-            # Get available symbols
-            symbols = mt5.symbols_get()
-            if symbols is None:
-                logger.error("Failed to get symbols")
-                return False
+                # Get available symbols
+                symbols = mt5.symbols_get()
+                if symbols is None:
+                    logger.error("Failed to get symbols")
+                    return False
             
-            self.available_symbols = [symbol.name for symbol in symbols if symbol.name]
-            self.mt5_connected = True
-            self.demo_mode = False
+                self.available_symbols = [symbol.name for symbol in symbols if symbol.name]
+                self._index_symbols()
+                self.mt5_connected = True
+                self.connection_generation += 1
+                self.demo_mode = False
             
-            logger.info(f"✅ Successfully connected to MT5")
-            logger.info(f"📊 Available symbols: {len(self.available_symbols)}")
+                logger.info(f"✅ Successfully connected to MT5")
+                logger.info(f"📊 Available symbols: {len(self.available_symbols)}")
             
-            return True
+                return True
             
-        except Exception as e:
-            logger.error(f"❌ Error initializing MT5: {str(e)}")
-            # Check if it's a common Windows issue
-            if platform.system() == "Windows":
-                logger.info("💡 Windows troubleshooting tips:")
-                logger.info("   1. Make sure MT5 terminal is running")
-                logger.info("   2. Run as administrator if needed")
-                logger.info("   3. Check Windows Defender/antivirus settings")
-                logger.info("   4. Verify MT5 allows DLL imports")
-            return False
+            except Exception as e:
+                logger.error(f"❌ Error initializing MT5: {str(e)}")
+                # Check if it's a common Windows issue
+                if platform.system() == "Windows":
+                    logger.info("💡 Windows troubleshooting tips:")
+                    logger.info("   1. Make sure MT5 terminal is running")
+                    logger.info("   2. Run as administrator if needed")
+                    logger.info("   3. Check Windows Defender/antivirus settings")
+                    logger.info("   4. Verify MT5 allows DLL imports")
+                return False
+    
+    
+    def _index_symbols(self):
+        """Precompute a numpy array of symbol names for vectorized filtering"""
+        self._symbols_np = np.array(self.available_symbols, dtype=str)
+        self._available_symbols_set = set(self.available_symbols)
+    
+    def common_symbols(self, markers: List[str]) -> List[str]:
+        """Available symbols containing any of the markers, in provider order"""
+        # One C-level substring scan per marker over the precomputed name array
+        mask = np.zeros(len(self._symbols_np), dtype=bool)
+        for marker in markers:
+            mask |= np.char.find(self._symbols_np, marker) >= 0
+        return self._symbols_np[mask].tolist()
+    
+    def default_symbol_index(self, symbols: List[str], default: str = 'BTCUSD') -> int:
+        """Index of the default symbol in a list of choices, or 0 when it isn't offered"""
+        # The set answers the common "not available" case without touching the list
+        if default not in self._available_symbols_set:
+            return 0
+        try:
+            return symbols.index(default)
+        except ValueError:
+            return 0
     
     def get_symbol_info(self, symbol: str) -> Dict:
         """
@@ -185,13 +244,18 @@ class MetaTraderDataProvider:
         if not self.mt5_connected:
             return {}
         
+        cached = self._symbol_info_cache.get(symbol)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
         try:
-            symbol_info = mt5.symbol_info(symbol)
+            with _MT5_LOCK:
+                symbol_info = mt5.symbol_info(symbol)
             if symbol_info is None:
                 logger.error(f"Symbol {symbol} not found")
                 return {}
             
-            return {
+            info = {
                 'name': symbol_info.name,
                 'description': symbol_info.description,
                 'currency_base': symbol_info.currency_base,
@@ -204,6 +268,8 @@ class MetaTraderDataProvider:
                 'lot_step': symbol_info.volume_step,
                 'spread': symbol_info.spread
             }
+            self._symbol_info_cache[symbol] = (time.monotonic() + SYMBOL_INFO_TTL, info)
+            return info
             
         except Exception as e:
             logger.error(f"Error getting symbol info for {symbol}: {str(e)}")
@@ -253,41 +319,27 @@ class MetaTraderDataProvider:
             return pd.DataFrame()
         
         try:
-            # Map timeframe strings to MT5 constants
-            timeframe_map = {
-                'M1': mt5.TIMEFRAME_M1,
-                'M5': mt5.TIMEFRAME_M5,
-                'M15': mt5.TIMEFRAME_M15,
-                'M30': mt5.TIMEFRAME_M30,
-                'H1': mt5.TIMEFRAME_H1,
-                'H4': mt5.TIMEFRAME_H4,
-                'D1': mt5.TIMEFRAME_D1,
-                'W1': mt5.TIMEFRAME_W1,
-                'MN1': mt5.TIMEFRAME_MN1
-            }
-            
-            mt5_timeframe = timeframe_map.get(timeframe, mt5.TIMEFRAME_H1)
+            mt5_timeframe = _TF_MAP.get(timeframe, _TF_MAP['H1'])
             
-            # Get historical data
-            rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
+            key = (symbol, timeframe)
+            cached = self._bar_cache.get(key)
             
-            if rates is None or len(rates) == 0:
-                logger.error(f"No data received for {symbol}")
-                return pd.DataFrame()
+            df = None
+            if cached is not None and len(cached) >= count:
+                df = self._fetch_new_bars(symbol, mt5_timeframe, cached, count)
             
-            # Convert to DataFrame
-            df = pd.DataFrame(rates)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df.set_index('time', inplace=True)
+            if df is None:
+                # Get the full window of historical data
+                with _MT5_LOCK:
+                    rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
+                
+                if rates is None or len(rates) == 0:
+                    logger.error(f"No data received for {symbol}")
+                    return pd.DataFrame()
+                
+                df = self._rates_to_frame(rates)
             
-            # Rename columns to standard format
-            df.rename(columns={
-                'open': 'Open',
-                'high': 'High',
-                'low': 'Low',
-                'close': 'Close',
-                'tick_volume': 'Volume'
-            }, inplace=True)
+            self._bar_cache[key] = df
             
             logger.info(f"✅ Retrieved {len(df)} records for {symbol} ({timeframe})")
             return df
@@ -296,6 +348,40 @@ class MetaTraderDataProvider:
             logger.error(f"Error getting historical data: {str(e)}")
             return pd.DataFrame()
     
+    def _fetch_new_bars(self, symbol: str, mt5_timeframe, cached: pd.DataFrame, count: int) -> Optional[pd.DataFrame]:
+        """
+        Fetch only the bars since the last cached one and append them
+        
+        Returns None when the cache can't be extended and a full fetch is needed
+        """
+        # Start at the last cached bar - it may still have been forming.
+        # The end is padded past now to cover broker server-time offsets.
+        date_from = int(cached.index[-1].timestamp())
+        date_to = int(time.time()) + 2 * 86400
+        with _MT5_LOCK:
+            rates = mt5.copy_rates_range(symbol, mt5_timeframe, date_from, date_to)
+        
+        if rates is None or len(rates) == 0:
+            return None
+        
+        new_bars = self._rates_to_frame(rates)
+        df = pd.concat([cached[cached.index < new_bars.index[0]], new_bars])
+        return df.iloc[-count:]
+    
+    @staticmethod
+    def _rates_to_frame(rates) -> pd.DataFrame:
+        """Convert an MT5 rates array to an OHLCV DataFrame indexed by time"""
+        # Pull the fields straight from the structured array and build the
+        # frame once with its final column names
+        index = pd.DatetimeIndex(pd.to_datetime(rates['time'], unit='s'), name='time')
+        return pd.DataFrame({
+            'Open': rates['open'].astype(OHLC_DTYPE, copy=False),
+            'High': rates['high'].astype(OHLC_DTYPE, copy=False),
+            'Low': rates['low'].astype(OHLC_DTYPE, copy=False),
+            'Close': rates['close'].astype(OHLC_DTYPE, copy=False),
+            'Volume': rates['tick_volume'].astype(VOLUME_DTYPE, copy=False)
+        }, index=index)
+    
     def _get_demo_historical_data(self, symbol: str, timeframe: str, count: int = 1000) -> pd.DataFrame:
         """Generate demo historical data when MT5 is not available"""
         logger.info(f"📊 Generating demo data for {symbol} ({count} points)")
@@ -381,7 +467,8 @@ class MetaTraderDataProvider:
             return {}
         
         try:
-            tick = mt5.symbol_info_tick(symbol)
+            with _MT5_LOCK:
+                tick = mt5.symbol_info_tick(symbol)
             if tick is None:
                 logger.error(f"No current price for {symbol}")
                 return {}
@@ -392,7 +479,7 @@ class MetaTraderDataProvider:
                 'ask': tick.ask,
                 'price': (tick.bid + tick.ask) / 2,
                 'spread': tick.ask - tick.bid,
-                'time': datetime.fromtimestamp(tick.time)
+                'time': np.datetime64(int(tick.time), 's')
             }
             
         except Exception as e:
@@ -427,8 +514,18 @@ class MetaTraderDataProvider:
         """
         if MT5_AVAILABLE and self.mt5_connected:
             try:
-                mt5.shutdown()
+                with _MT5_LOCK:
+                    mt5.shutdown()
                 self.mt5_connected = False
+                self.connection_generation += 1
+                
+                # Drop everything tied to this connection so a reconnect
+                # (possibly to another server) starts from fresh data
+                self.account_info = None
+                self.available_symbols = []
+                self._index_symbols()
+                self._bar_cache.clear()
+                self._symbol_info_cache.clear()
                 logger.info("✅ MT5 connection closed properly")
             except Exception as e:
                 logger.error(f"Error shutting down MT5: {str(e)}")
@@ -460,10 +557,11 @@ class MetaTraderStreamlitUI:
             return None
         
         # Connection status
-        if 'mt5_provider' in st.session_state and st.session_state.mt5_provider.mt5_connected:
+        provider = st.session_state.get('mt5_provider')
+        if provider is not None and provider.mt5_connected:
             st.sidebar.success("✅ Connected to MT5")
             if st.sidebar.button("🔌 Disconnect"):
-                st.session_state.mt5_provider.shutdown()
+                provider.shutdown()
                 st.experimental_rerun()
             return None
         
@@ -514,14 +612,14 @@ class MetaTraderStreamlitUI:
             return None
         
         # Filter for common trading symbols
-        common_symbols = [s for s in symbols if any(x in s for x in ['BTC', 'EUR', 'GBP', 'USD', 'XAU'])]
+        common_symbols = mt5_provider.common_symbols(['BTC', 'EUR', 'GBP', 'USD', 'XAU'])
         if common_symbols:
             symbols = common_symbols
         
         selected = st.sidebar.selectbox(
             "Choose Symbol:",
             options=symbols,
-            index=0 if 'BTCUSD' not in symbols else symbols.index('BTCUSD')
+            index=mt5_provider.default_symbol_index(symbols)
         )
         
         return selected
@@ -567,11 +665,15 @@ class MetaTraderStreamlitUI:
         
         account = mt5_provider.account_info
         st.sidebar.header("💼 Account Info")
-        st.sidebar.write(f"**Login:** {account.login}")
-        st.sidebar.write(f"**Server:** {account.server}")
-        st.sidebar.write(f"**Balance:** {account.balance} {account.currency}")
-        st.sidebar.write(f"**Equity:** {account.equity} {account.currency}")
-        st.sidebar.write(f"**Leverage:** 1:{account.leverage}")
+        currency = account.currency
+        # One markdown element instead of five separate sidebar writes
+        st.sidebar.markdown(
+            f"**Login:** {account.login}  \n"
+            f"**Server:** {account.server}  \n"
+            f"**Balance:** {account.balance} {currency}  \n"
+            f"**Equity:** {account.equity} {currency}  \n"
+            f"**Leverage:** 1:{account.leverage}"
+        )
     
     @staticmethod
     def render_connection_status(mt5_provider: MetaTraderDataProvider):
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compiled indicator kernels for the built-in (non TA-Lib) fallback
+Uses numba when installed and plain Python loops otherwise
+"""
+
+import numpy as np
+
+# Numba is optional - the kernels below still run (slower) without it
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _njit(func):
+    """Compile with numba when available, otherwise return the function unchanged"""
+    if HAS_NUMBA:
+        return njit(cache=True)(func)
+    return func
+
+
+@_njit
+def _ema(x, span):
+    """Exponential moving average seeded with the first finite value"""
+    n = x.shape[0]
+    out = np.empty_like(x)
+    out[:] = np.nan
+    alpha = 2.0 / (span + 1.0)
+
+    start = 0
+    while start < n and np.isnan(x[start]):
+        start += 1
+    if start == n:
+        return out
+
+    out[start] = x[start]
+    for i in range(start + 1, n):
+        if np.isnan(x[i]):
+            out[i] = out[i - 1]
+        else:
+            out[i] = alpha * x[i] + (1.0 - alpha) * out[i - 1]
+    return out
+
+
+@_njit
+def _rsi(close, window):
+    """Relative Strength Index with Wilder's smoothing, carrying across NaN bars"""
+    n = close.shape[0]
+    out = np.empty_like(close)
+    out[:] = np.nan
+
+    # Seed with the simple average of the first `window` finite changes
+    count = 0
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if np.isnan(delta):
+            out[i] = out[i - 1]
+            continue
+        gain = max(delta, 0.0)
+        loss = max(-delta, 0.0)
+        if count < window:
+            avg_gain += gain / window
+            avg_loss += loss / window
+            count += 1
+            if count < window:
+                continue
+        else:
+            avg_gain = (avg_gain * (window - 1) + gain) / window
+            avg_loss = (avg_loss * (window - 1) + loss) / window
+        if avg_loss == 0.0:
+            out[i] = 100.0
+        else:
+            out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out
+
+
+@_njit
+def _bbands(close, window, num_std):
+    """Bollinger Bands from a running sum / sum of squares (sample std)"""
+    n = close.shape[0]
+    upper = np.empty_like(close)
+    middle = np.empty_like(close)
+    lower = np.empty_like(close)
+    upper[:] = np.nan
+    middle[:] = np.nan
+    lower[:] = np.nan
+    if n < window or window < 2:
+        return upper, middle, lower
+
+    # Shift by the first finite value to keep the sum of squares well conditioned
+    shift = 0.0
+    for i in range(n):
+        if not np.isnan(close[i]):
+            shift = close[i]
+            break
+
+    # NaNs never enter the sums; like pandas, any NaN in the window blanks it
+    total = 0.0
+    total_sq = 0.0
+    nan_count = 0
+    for i in range(n):
+        value = close[i] - shift
+        if np.isnan(value):
+            nan_count += 1
+        else:
+            total += value
+            total_sq += value * value
+        if i >= window:
+            dropped = close[i - window] - shift
+            if np.isnan(dropped):
+                nan_count -= 1
+            else:
+                total -= dropped
+                total_sq -= dropped * dropped
+        if i >= window - 1 and nan_count == 0:
+            mean = total / window
+            var = (total_sq - total * mean) / (window - 1)
+            std = np.sqrt(var) if var > 0.0 else 0.0
+            middle[i] = mean + shift
+            upper[i] = middle[i] + num_std * std
+            lower[i] = middle[i] - num_std * std
+    return upper, middle, lower
+
+
+@_njit
+def _stoch(high, low, close, k_window, d_window):
+    """Stochastic %K / %D over a trailing high/low window"""
+    n = close.shape[0]
+    k = np.empty_like(close)
+    d = np.empty_like(close)
+    k[:] = np.nan
+    d[:] = np.nan
+
+    for i in range(k_window - 1, n):
+        lowest = low[i]
+        highest = high[i]
+        for j in range(i - k_window + 1, i):
+            if low[j] < lowest:
+                lowest = low[j]
+            if high[j] > highest:
+                highest = high[j]
+        price_range = highest - lowest
+        if price_range != 0.0:
+            k[i] = 100.0 * (close[i] - lowest) / price_range
+
+    for i in range(k_window + d_window - 2, n):
+        total = 0.0
+        for j in range(i - d_window + 1, i + 1):
+            total += k[j]
+        d[i] = total / d_window
+    return k, d